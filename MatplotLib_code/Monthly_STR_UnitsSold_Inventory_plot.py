@@ -1,13 +1,7 @@
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from db_connection import get_connection  # import the connection setup
-
-# === Connect to database ===
-conn = get_connection()
-if conn is None:
-    exit(1)
+from db_connection import cached_read_sql, clean_region_month, show_plot  # data loading, cleaning and plot-saving helpers
 
 # === SQL Query ===
 query = """
@@ -43,38 +37,30 @@ ORDER BY Month, Region;
 """
 
 # === Fetch Data from MySQL===
-df = pd.read_sql(query, conn)
-conn.close()
+df = cached_read_sql(query)
+if df is None:
+    exit(1)
 
 # === Data Cleaning ===
-df['Region'] = df['Region'].astype(str).str.replace('\x00', '', regex=False).str.strip()
-df['Month'] = df['Month'].astype(str).str.replace('\x00', '', regex=False).str.strip()
-df['Month'] = pd.to_datetime(df['Month'], format='%Y-%m', errors='coerce')
-df = df.dropna(subset=['Month'])
+df = clean_region_month(df)
 
 # === Plot setup ===
 sns.set_theme(style="whitegrid")
-regions = df['Region'].unique()
-colors = sns.color_palette("tab10", n_colors=len(regions))
+regions = df.groupby('Region', sort=False, observed=True)
+colors = sns.color_palette("tab10", n_colors=regions.ngroups)
 
 fig, ax1 = plt.subplots(figsize=(15, 8))
+ax2 = ax1.twinx()
 
-# Plot Units Sold and Inventory (left y-axis)
-for i, region in enumerate(regions):
-    sub_df = df[df['Region'] == region]
-    ax1.plot(sub_df['Month'], sub_df['Total_Units_Sold'], label=f'{region} - Units Sold', linestyle='-', color=colors[i])
-    ax1.plot(sub_df['Month'], sub_df['Weighted_Avg_Inventory'], label=f'{region} - Inventory', linestyle='--', color=colors[i], alpha=0.5)
+# Units Sold and Inventory (left y-axis) and Sell-Through Rate (right y-axis) in one pass over the regions
+for (region, sub_df), color in zip(regions, colors):
+    ax1.plot(sub_df['Month'], sub_df['Total_Units_Sold'], label=f'{region} - Units Sold', linestyle='-', color=color)
+    ax1.plot(sub_df['Month'], sub_df['Weighted_Avg_Inventory'], label=f'{region} - Inventory', linestyle='--', color=color, alpha=0.5)
+    ax2.plot(sub_df['Month'], sub_df['Sell_Through_Rate_Percent'], label=f'{region} - STR (%)', linestyle=':', color=color)
 
 ax1.set_xlabel("Month(quarterly)", fontsize=12)
 ax1.set_ylabel("Units Sold / Inventory", fontsize=12)
 ax1.tick_params(axis='x', rotation=45)
-
-# Plot Sell-Through Rate (right y-axis)
-ax2 = ax1.twinx()
-for i, region in enumerate(regions):
-    sub_df = df[df['Region'] == region]
-    ax2.plot(sub_df['Month'], sub_df['Sell_Through_Rate_Percent'], label=f'{region} - STR (%)', linestyle=':', color=colors[i])
-
 ax2.set_ylabel("Sell-Through Rate (%)", fontsize=12)
 
 # Combine legends from both axes
@@ -97,4 +83,4 @@ plt.title("Sell-Through Rate vs Units Sold and Inventory by Region", fontsize=16
 plt.tight_layout()
 
 # === Show Plot ===
-plt.show()
\ No newline at end of file
+show_plot(__file__)
\ No newline at end of file
@@ -1,14 +1,8 @@
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from db_connection import get_connection  # import the connection setup
-
-# === Connect to database ===
-conn = get_connection()
-if conn is None:
-    exit(1)
+from db_connection import cached_read_sql, clean_region_month, show_plot  # data loading, cleaning and plot-saving helpers
 
 # === SQL Query ===
 query = """
@@ -44,14 +38,12 @@ ORDER BY Month, Region;
 """
 
 # === Fetch Data from MySQL ===
-df = pd.read_sql(query, conn)
-conn.close()
+df = cached_read_sql(query, dtype_backend="pyarrow")  # read-only plot, keep the Arrow buffers
+if df is None:
+    exit(1)
 
 # === Data Cleaning ===
-df['Region'] = df['Region'].astype(str).str.replace('\x00', '', regex=False).str.strip()
-df['Month'] = df['Month'].astype(str).str.replace('\x00', '', regex=False).str.strip()
-df['Month'] = pd.to_datetime(df['Month'], format='%Y-%m', errors='coerce')
-df = df.dropna(subset=['Month'])
+df = clean_region_month(df)
 
 # === Plot Setup ===
 plt.figure(figsize=(14, 7))
@@ -68,8 +60,9 @@ sns.lineplot(
 )
 
 # === Y-Axis Scaling ===
-y_min = max(0, df["Sell_Through_Rate_Percent"].min() - 5)
-y_max = df["Sell_Through_Rate_Percent"].max() + 5
+str_values = df["Sell_Through_Rate_Percent"].to_numpy(dtype=float, na_value=np.nan)
+y_min = max(0.0, np.nanmin(str_values) - 5)
+y_max = np.nanmax(str_values) + 5
 range_span = y_max - y_min
 step = 2 if range_span <= 20 else 5
 plt.yticks(np.arange(y_min, y_max + 1, step))
@@ -83,4 +76,4 @@ plt.legend(title='Region')
 plt.tight_layout()
 
 # === Show Plot ===
-plt.show()
\ No newline at end of file
+show_plot(__file__)
\ No newline at end of file
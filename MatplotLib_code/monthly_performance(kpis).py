@@ -1,12 +1,6 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-from db_connection import get_connection
-
-# === Connect to DB ===
-conn = get_connection()
-if conn is None:
-    print("Database connection failed.")
-    exit(1)
+from db_connection import cached_read_sql, show_plot
 
 # === Fetch KPI Data ===
 query = """
@@ -18,48 +12,52 @@ SELECT
     ROUND(SUM(i.units_sold) / NULLIF(AVG(i.inventory_level), 0), 2) AS inventory_turnover,
     ROUND(SUM(i.units_sold) / NULLIF(SUM(i.units_sold) + MAX(i.inventory_level), 0) * 100, 2) AS sell_through_rate
 FROM inventory_snapshots i
+/* store_range */
 GROUP BY i.store_id, month
 ORDER BY i.store_id, month;
 """
-df = pd.read_sql(query, conn)
-conn.close()
+df = cached_read_sql(query, partition_on='i.store_id')
+if df is None:
+    print("Database connection failed.")
+    exit(1)
 
-# === Traffic Light Function ===
-def traffic_light(val, kpi):
-    if kpi == 'average_stock_level':
-        if val > 100: return 'green'
-        elif val >= 70: return 'yellow'
-        else: return 'red'
-    elif kpi == 'stockout_rate':
-        if val < 0.1: return 'green'
-        elif val <= 0.3: return 'yellow'
-        else: return 'red'
-    elif kpi == 'inventory_turnover':
-        if val > 2.5: return 'green'
-        elif val >= 1.5: return 'yellow'
-        else: return 'red'
-    elif kpi == 'sell_through_rate':
-        if val > 70: return 'green'
-        elif val >= 50: return 'yellow'
-        else: return 'red'
-    return 'gray'
+# === Traffic Light Thresholds ===
+# (green cut-off, yellow cut-off, higher is better)
+traffic_thresholds = {
+    'average_stock_level': (100, 70, True),
+    'stockout_rate': (0.1, 0.3, False),
+    'inventory_turnover': (2.5, 1.5, True),
+    'sell_through_rate': (70, 50, True),
+}
 
 kpi_list = ['average_stock_level', 'stockout_rate', 'inventory_turnover', 'sell_through_rate']
-color_map = {'green': '#4caf50', 'yellow': '#ffeb3b', 'red': '#f44336', 'gray': '#888888'}
+color_map = {'green': '#4caf50', 'yellow': '#ffeb3b', 'red': '#f44336'}
+
+def traffic_light_colors(vals, kpi):
+    # Classify a whole KPI column at once instead of calling a function per value
+    green, yellow, higher_is_better = traffic_thresholds[kpi]
+    if higher_is_better:
+        conditions = [vals > green, vals >= yellow]
+    else:
+        conditions = [vals < green, vals <= yellow]
+    return np.select(conditions, [color_map['green'], color_map['yellow']], default=color_map['red'])
+
+# === Sorted (store_id, month) Index ===
+# Store slices and month ranges are then index lookups instead of boolean scans or re-sorts
+df = df.set_index(['store_id', 'month']).sort_index()
+months = df.index.get_level_values('month').unique().sort_values()
+groups = {store: df.xs(store, level='store_id') for store in df.index.get_level_values('store_id').unique()}
 
 # === Plot Multi-KPI Dashboard with Sparklines ===
-stores = df['store_id'].unique()
-months = sorted(df['month'].unique())
 
 fig, axes = plt.subplots(len(kpi_list), 1, figsize=(16, 10), sharex=True)
 for i, kpi in enumerate(kpi_list):
     ax = axes[i]
-    for store in stores:
-        sub = df[df['store_id'] == store]
-        ax.plot(sub['month'], sub[kpi], marker='o', label=f'Store {store}')
-        # Traffic lights
-        colors = [color_map[traffic_light(v, kpi)] for v in sub[kpi]]
-        ax.scatter(sub['month'], sub[kpi], c=colors, s=120, edgecolors='black', zorder=3)
+    kpi_colors = traffic_light_colors(df[kpi].to_numpy(dtype=float), kpi)
+    for store, sub in groups.items():
+        ax.plot(sub.index, sub[kpi], marker='o', label=f'Store {store}')
+    # Traffic lights for every store in one collection
+    ax.scatter(df.index.get_level_values('month'), df[kpi], c=kpi_colors, s=120, edgecolors='black', zorder=3)
     ax.set_ylabel(kpi.replace('_', ' ').title())
     ax.set_title(f"{kpi.replace('_', ' ').title()} (Traffic Light)")
     ax.legend(title='Store', loc='upper left')
@@ -67,21 +65,21 @@ for i, kpi in enumerate(kpi_list):
 plt.xlabel("Month")
 plt.xticks(rotation=45)
 plt.tight_layout()
-plt.show()
+show_plot(__file__, '_dashboard')
 
 # === Sparklines for last 3 months ===
 import seaborn as sns
 fig2, axes2 = plt.subplots(len(kpi_list), 1, figsize=(16, 7), sharex=True)
-last3months = sorted(months)[-3:]
+last3months = months[-3:]
+recent_groups = {store: sub.loc[last3months[0]:] for store, sub in groups.items()}
 for i, kpi in enumerate(kpi_list):
     ax = axes2[i]
-    for store in stores:
-        sub = df[(df['store_id'] == store) & (df['month'].isin(last3months))]
-        ax.plot(sub['month'], sub[kpi], marker='o', label=f'Store {store}')
+    for store, sub in recent_groups.items():
+        ax.plot(sub.index, sub[kpi], marker='o', label=f'Store {store}')
     ax.set_ylabel(kpi.replace('_', ' ').title())
     ax.set_title(f"{kpi.replace('_', ' ').title()} (Last 3-Month Sparkline)")
     ax.legend(title='Store', loc='upper left')
 plt.xlabel("Month")
 plt.xticks(rotation=45)
 plt.tight_layout()
-plt.show()
+show_plot(__file__, '_sparklines')
@@ -1,13 +1,7 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from db_connection import get_connection
-
-# === Connect to DB ===
-conn = get_connection()
-if conn is None:
-    print("Database connection failed.")
-    exit(1)
+from db_connection import cached_read_sql, show_plot
 
 # === SQL Query: Average units sold by category and season ===
 query = """
@@ -21,8 +15,18 @@ JOIN seasonality se ON i.season_id = se.season_id
 GROUP BY p.category, se.season_name
 ORDER BY p.category, se.season_name;
 """
-df = pd.read_sql(query, conn)
-conn.close()
+df = cached_read_sql(query)
+if df is None:
+    print("Database connection failed.")
+    exit(1)
+
+# === Categorical keys for the grouped plot (seasons in calendar order) ===
+df['category'] = df['category'].astype('category')
+df['season_name'] = pd.Categorical(
+    df['season_name'],
+    categories=['Winter', 'Spring', 'Summer', 'Autumn'],
+    ordered=True
+)
 
 # === Plot: Grouped Bar Chart ===
 plt.figure(figsize=(12, 7))
@@ -41,4 +45,4 @@ ax.set_xlabel("Season", fontsize=12)
 ax.set_ylabel("Average Units Sold", fontsize=12)
 ax.legend(title="Product Category", bbox_to_anchor=(1.05, 1), loc='upper left')
 plt.tight_layout()
-plt.show()
+show_plot(__file__)
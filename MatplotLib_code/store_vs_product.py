@@ -1,54 +1,42 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 from matplotlib.colors import ListedColormap, BoundaryNorm
-from db_connection import get_connection
-
-# === Connect to DB ===
-conn = get_connection()
-if conn is None:
-    exit(1)
+from db_connection import cached_read_sql, show_plot
 
 # === SQL Query ===
+# Stock status codes (index into status_labels) are computed and reduced per store/product in the DB
 query = """
 SELECT 
     s.store_id,
     i.product_id,
-    i.inventory_level,
-    i.units_ordered
+    MIN(
+        CASE
+            WHEN i.inventory_level = 0 THEN 0
+            WHEN i.inventory_level < i.units_ordered * 0.5 THEN 1
+            WHEN i.inventory_level < i.units_ordered THEN 2
+            ELSE 3
+        END
+    ) AS status_code
 FROM inventory_snapshots i
 JOIN stores s ON i.store_id = s.store_id
+/* store_range */
+GROUP BY s.store_id, i.product_id
 """
 
 # === Load Data ===
-df = pd.read_sql(query, conn)
-conn.close()
-
-# === Define Stock Status Logic ===
-def get_stock_status(row):
-    if row['inventory_level'] == 0:
-        return "Out of Stock"
-    elif row['inventory_level'] < row['units_ordered'] * 0.5:
-        return "Below Reorder"
-    elif row['inventory_level'] < row['units_ordered']:
-        return "Near Reorder"
-    else:
-        return "Adequate"
-
-df["Stock_Status"] = df.apply(get_stock_status, axis=1)
+df = cached_read_sql(query, partition_on='i.store_id')
+if df is None:
+    exit(1)
 
-# === Status to Code Mapping ===
+# === Stock Status Labels ===
 status_labels = ["Out of Stock", "Below Reorder", "Near Reorder", "Adequate"]
 status_colors = ["#d62728", "#ff7f0e", "#ffdf00", "#2ca02c"]
-status_map = {label: i for i, label in enumerate(status_labels)}
-df["Status_Code"] = df["Stock_Status"].map(status_map)
 
 # === Pivot Table ===
-pivot_df = df.pivot_table(
-    index="product_id",
-    columns="store_id",
-    values="Status_Code",
-    aggfunc="min"
+pivot_df = (
+    df.groupby(["product_id", "store_id"], observed=True)["status_code"]
+    .min()
+    .unstack("store_id")
 )
 
 # === Colormap and Normalization ===
@@ -56,29 +44,37 @@ cmap = ListedColormap(status_colors)
 bounds = [-0.5, 0.5, 1.5, 2.5, 3.5]  # one bin per category
 norm = BoundaryNorm(bounds, cmap.N)
 
-# === Plot Heatmap ===
-plt.figure(figsize=(14, 10))
-heatmap = sns.heatmap(
-    pivot_df,
+# === Plot Heatmap (single image instead of one patch per cell) ===
+n_products, n_stores = pivot_df.shape
+fig, ax = plt.subplots(figsize=(14, 10))
+im = ax.imshow(
+    pivot_df.to_numpy(dtype=float),
     cmap=cmap,
     norm=norm,
-    linewidths=0.5,
-    linecolor='gray',
-    cbar_kws={'ticks': [0, 1, 2, 3]}
+    aspect='auto',
+    interpolation='nearest'
 )
 
-# === Fix Colorbar Labels ===
-colorbar = heatmap.collections[0].colorbar
-colorbar.set_ticks([0, 1, 2, 3])
+# Cell borders
+ax.set_xticks(np.arange(n_stores + 1) - 0.5, minor=True)
+ax.set_yticks(np.arange(n_products + 1) - 0.5, minor=True)
+ax.grid(which='minor', color='gray', linewidth=0.5)
+ax.tick_params(which='minor', length=0)
+
+ax.set_xticks(range(n_stores))
+ax.set_xticklabels(pivot_df.columns, rotation=45, ha='right')
+ax.set_yticks(range(n_products))
+ax.set_yticklabels(pivot_df.index, fontsize=8)
+
+# === Colorbar Labels ===
+colorbar = fig.colorbar(im, ax=ax, ticks=[0, 1, 2, 3])
 colorbar.set_ticklabels(status_labels)
 colorbar.ax.tick_params(labelsize=10)
 colorbar.set_label("Stock Status", fontsize=12)
 
 # === Titles and Axes ===
-plt.title("Product-Level Stock Status Heatmap Across Stores", fontsize=16)
-plt.xlabel("Store ID", fontsize=12)
-plt.ylabel("Product ID", fontsize=12)
-plt.xticks(rotation=45, ha='right')
-plt.yticks(fontsize=8)
+ax.set_title("Product-Level Stock Status Heatmap Across Stores", fontsize=16)
+ax.set_xlabel("Store ID", fontsize=12)
+ax.set_ylabel("Product ID", fontsize=12)
 plt.tight_layout()
-plt.show()
+show_plot(__file__)
@@ -1,12 +1,7 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from db_connection import get_connection
-
-# --- DB Connection ---
-conn = get_connection()
-if conn is None:
-    exit("Failed to connect to database.")
+from db_connection import cached_read_sql, show_plot
 
 # --- SQL Query ---
 query = """
@@ -30,6 +25,7 @@ inventory_status AS (
     JOIN stores s ON inv.store_id = s.store_id
     JOIN regions r ON inv.region_id = r.region_id
     JOIN products p ON inv.product_id = p.product_id
+    /* store_range */
 )
 SELECT 
     store_id,
@@ -42,24 +38,29 @@ ORDER BY store_id;
 """
 
 # --- Fetch Data ---
-df = pd.read_sql(query, conn)
-conn.close()
+df = cached_read_sql(query, partition_on='inv.store_id')
+if df is None:
+    exit("Failed to connect to database.")
+df['product_count'] = df['product_count'].astype('int16')  # wide enough for the stacked/summed totals below
 
 # --- Pivot for Stacked Bar ---
-pivot_df = df.pivot_table(index=['store_id', 'region'], columns='stock_status', values='product_count', fill_value=0).reset_index()
+# (store_id, region, stock_status) is already unique from the GROUP BY, so sum() just reshapes
+pivot_df = (
+    df.groupby(['store_id', 'region', 'stock_status'], observed=True)['product_count']
+    .sum()
+    .unstack('stock_status', fill_value=0)
+    .reset_index()
+)
 
-# Ensure consistent order
+# Ensure consistent order (statuses missing from the data become zero columns)
 status_order = ['Out of Stock', 'Below Reorder', 'Near Reorder', 'Adequate Stock']
-for status in status_order:
-    if status not in pivot_df.columns:
-        pivot_df[status] = 0
+pivot_df = pivot_df.reindex(columns=['store_id', 'region'] + status_order, fill_value=0)
 
 # Sort stores for consistent plotting
 pivot_df = pivot_df.sort_values(by='store_id')
 
 # --- Plot: Stacked Bar Chart ---
 fig, ax = plt.subplots(figsize=(14, 8))
-bottom = None
 colors = {
     'Out of Stock': '#d73027',
     'Below Reorder': '#fc8d59',
@@ -67,11 +68,13 @@ colors = {
     'Adequate Stock': '#91cf60'
 }
 
-x = pivot_df['store_id']
-for status in status_order:
-    y = pivot_df[status]
-    ax.bar(x, y, bottom=bottom, label=status, color=colors[status])
-    bottom = y if bottom is None else bottom + y
+# Segment heights as one (stores x statuses) matrix; each segment starts at the running total of the previous ones
+x = pivot_df['store_id'].to_numpy()
+counts = pivot_df[status_order].to_numpy()
+bottoms = np.zeros_like(counts)
+bottoms[:, 1:] = counts.cumsum(axis=1)[:, :-1]
+for i, status in enumerate(status_order):
+    ax.bar(x, counts[:, i], bottom=bottoms[:, i], label=status, color=colors[status])
 
 ax.set_title('Inventory Status by Store (Stacked Bar)', fontsize=16)
 ax.set_ylabel('Number of Products')
@@ -79,17 +82,17 @@ ax.set_xlabel('Store ID')
 ax.legend(title='Stock Status')
 plt.xticks(rotation=45, ha='right')
 plt.tight_layout()
-plt.show()
+show_plot(__file__, '_stacked_bar')
 
 # --- Plot: Heatmap by Region and Store ---
-heatmap_df = pivot_df.copy()
-heatmap_df['Total_Issues'] = heatmap_df['Out of Stock'] + heatmap_df['Below Reorder'] + heatmap_df['Near Reorder']
+# Every status except 'Adequate Stock' (the last column of counts) counts as an issue
+heatmap_df = pivot_df[['store_id', 'region']].assign(Total_Issues=counts[:, :-1].sum(axis=1))
 pivot_heat = heatmap_df.pivot(index='region', columns='store_id', values='Total_Issues').fillna(0)
 
 plt.figure(figsize=(14, 6))
-sns.heatmap(pivot_heat, cmap='Reds', annot=True, fmt='.0f', linewidths=.5)
+sns.heatmap(pivot_heat, cmap='Reds', annot=True, fmt='.0f', linewidths=.5, rasterized=True)
 plt.title('Heatmap of Product Stock Issues by Store and Region', fontsize=16)
 plt.xlabel('Store ID')
 plt.ylabel('Region')
 plt.tight_layout()
-plt.show()
+show_plot(__file__, '_heatmap', dpi=200)
@@ -1,11 +1,39 @@
-
 import pyodbc
+import pandas as pd
+import pyarrow as pa
+import matplotlib
+import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from urllib.parse import quote
+import hashlib
 import os
+import sys
+import time
+
+try:
+    import connectorx as cx
+except ImportError:  # plain pyodbc reads still work without it
+    cx = None
 
 load_dotenv()  # to load variables from .env
 
-def get_connection():
+# Batch/CI runs (no terminal) skip the GUI toolkit and save figures instead of showing them
+BATCH_MODE = not sys.stdout.isatty()
+if BATCH_MODE:
+    matplotlib.use('Agg')
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+_engine = None  # pooled pyodbc connections, created on first use
+_store_ids = None  # sorted store_id list, fetched once and reused to split partitioned reads
+
+# Partitioned queries mark where the store filter goes; as a SQL comment the query still runs unfiltered as written
+PARTITION_MARKER = '/* store_range */'
+
+def _connect():
     conn_str = (
         f"DRIVER={os.getenv('DB_DRIVER')};"
         f"SERVER={os.getenv('DB_SERVER')};"
@@ -14,9 +42,168 @@ def get_connection():
         f"UID={os.getenv('DB_USER')};"
         f"PWD={os.getenv('DB_PASSWORD')};"
     )
+    conn = pyodbc.connect(conn_str)
+    conn.autocommit = True  # read-only queries, no need to hold a transaction open
+    return conn
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            "mysql+pyodbc://",
+            creator=_connect,
+            pool_size=25,
+            max_overflow=0,
+            pool_pre_ping=True,
+        )
+    return _engine
+
+def get_connection():
+    # Use as `with get_connection() as conn:` so the connection goes back to the pool
     try:
-        conn = pyodbc.connect(conn_str)
-        return conn
-    except pyodbc.Error as e:
+        return get_engine().connect()
+    except (pyodbc.Error, DBAPIError) as e:
         print("Error connecting to database:", e)
-        return None
\ No newline at end of file
+        return None
+
+def get_conn_url():
+    # connectorx talks to MySQL natively, so it needs a URL instead of the ODBC string.
+    # Userinfo is only percent-decoded (no '+' -> space), so quote() with nothing left as safe
+    return (
+        f"mysql://{quote(os.getenv('DB_USER', ''), safe='')}:{quote(os.getenv('DB_PASSWORD', ''), safe='')}"
+        f"@{os.getenv('DB_SERVER')}:{os.getenv('DB_PORT')}/{os.getenv('DB_DATABASE')}"
+    )
+
+def fetch_df(query, params=()):
+    # pyodbc path: pull 10k rows per round-trip instead of one row per fetch
+    conn = get_connection()
+    if conn is None:
+        return None
+    with conn:
+        cur = conn.connection.cursor()
+        cur.arraysize = 10000
+        cur.execute(query, *params)
+        columns = [c[0] for c in cur.description]
+        rows = []
+        while True:
+            batch = cur.fetchmany()
+            if not batch:
+                break
+            rows.extend(batch)
+        cur.close()
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+def get_store_ids():
+    global _store_ids
+    if _store_ids is None:
+        df = read_sql("SELECT store_id FROM stores ORDER BY store_id")
+        if df is None:
+            return None
+        _store_ids = df['store_id'].tolist()
+    return _store_ids
+
+def _store_partitions(partition_num):
+    # store_id is VARCHAR, so split the sorted ids into contiguous BETWEEN ranges
+    store_ids = get_store_ids()
+    if not store_ids:
+        return None
+    size = -(-len(store_ids) // partition_num)
+    return [(chunk[0], chunk[-1]) for chunk in
+            (store_ids[i:i + size] for i in range(0, len(store_ids), size))]
+
+def _sql_literal(value):
+    # connectorx has no bound parameters, so quote the store ids ourselves
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+def _partition_queries(query, partition_on, partition_num, bind):
+    # One query per store range, with the marker replaced by a WHERE on partition_on;
+    # bind=True leaves ? placeholders and returns the range as parameters (pyodbc)
+    partitions = _store_partitions(partition_num)
+    if partitions is None:
+        return None
+    if bind:
+        sql = query.replace(PARTITION_MARKER, f"WHERE {partition_on} BETWEEN ? AND ?")
+        return [(sql, (lo, hi)) for lo, hi in partitions]
+    return [query.replace(PARTITION_MARKER, f"WHERE {partition_on} BETWEEN {_sql_literal(lo)} AND {_sql_literal(hi)}")
+            for lo, hi in partitions]
+
+def downcast(df):
+    # Counts and levels fit in the smallest int type. Floats stay float64: the KPI thresholds
+    # compare exact ROUND(..., 2) values (float32(0.3) > 0.3 would flip a yellow light to red)
+    for c in df.select_dtypes('int64').columns:
+        df[c] = pd.to_numeric(df[c], downcast='integer')
+    return df
+
+def clean_region_month(df):
+    # Region/Month come back NUL-padded from some MySQL drivers; strip once, parse Month, key Region as category
+    for col in ('Region', 'Month'):
+        df[col] = df[col].astype(str).str.replace('\x00', '', regex=False).str.strip()
+    df['Region'] = df['Region'].astype('category')
+    df['Month'] = pd.to_datetime(df['Month'], format='%Y-%m', errors='coerce')
+    return df.dropna(subset=['Month'])
+
+def read_sql(query, partition_on=None, partition_num=8, dtype_backend=None):
+    # With partition_on (e.g. "i.store_id"), the PARTITION_MARKER in `query` becomes a store-range filter;
+    # one query per range is run in parallel and the results are concatenated in store order.
+    # dtype_backend="pyarrow" keeps the columns Arrow-backed instead of copying them into NumPy blocks
+    if partition_on is not None and PARTITION_MARKER not in query:
+        raise ValueError(f"partitioned query has no {PARTITION_MARKER} marker for the store filter")
+    try:
+        if partition_on is None:
+            queries = query
+        else:
+            queries = _partition_queries(query, partition_on, partition_num, bind=cx is None)
+            if queries is None:
+                return None
+
+        arrow_backed = False
+        if cx is not None and dtype_backend == "pyarrow":
+            table = cx.read_sql(get_conn_url(), queries, return_type="arrow", protocol="binary")
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+            arrow_backed = True
+        elif cx is not None:
+            # Results are streamed straight into pandas columns by connectorx (no per-row Python fetch)
+            df = cx.read_sql(get_conn_url(), queries, return_type="pandas", protocol="binary")
+        elif partition_on is None:
+            df = fetch_df(queries)
+        else:
+            with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+                parts = list(pool.map(lambda q: fetch_df(*q), queries))
+            if any(part is None for part in parts):
+                return None
+            df = pd.concat(parts, ignore_index=True)
+        if df is not None and dtype_backend == "pyarrow" and not arrow_backed:
+            # Infer Arrow types the way the Parquet cache does (Decimal -> decimal128), so cold and cached runs match;
+            # convert_dtypes() would leave MySQL DECIMAL columns as object Decimals
+            df = pa.Table.from_pandas(df, preserve_index=False).to_pandas(types_mapper=pd.ArrowDtype)
+        elif df is not None and dtype_backend is not None and not arrow_backed:
+            df = df.convert_dtypes(dtype_backend=dtype_backend)
+    except Exception as e:
+        print("Error reading from database:", e)
+        return None
+    return None if df is None else downcast(df)
+
+def cached_read_sql(query, ttl_seconds=3600, **kwargs):
+    # Re-runs load the last result from .cache/ instead of querying MySQL, until it is ttl_seconds old.
+    # The read options are part of the key: the same SQL read with another dtype_backend is a different file
+    key_src = f"{get_conn_url()}\n{query}\n{sorted(kwargs.items())}"
+    key = hashlib.blake2b(key_src.encode(), digest_size=16).hexdigest()
+    path = os.path.join(CACHE_DIR, f"{key}.parquet")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl_seconds:
+        if kwargs.get('dtype_backend') is not None:
+            return pd.read_parquet(path, dtype_backend=kwargs['dtype_backend'])
+        return pd.read_parquet(path)
+
+    df = read_sql(query, **kwargs)
+    if df is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(path, compression='zstd')
+    return df
+
+def show_plot(script_path, suffix='', dpi=150):
+    # Interactive runs show the figure; batch runs save it as <script><suffix>.png next to the script
+    if not BATCH_MODE:
+        plt.show()
+        return
+    plt.savefig(f"{os.path.splitext(script_path)[0]}{suffix}.png", dpi=dpi, bbox_inches='tight')
+    plt.close()